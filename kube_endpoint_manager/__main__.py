@@ -9,11 +9,15 @@
 External kubernetes endpoint manager
 '''
 
+import re
 import time
+import queue
 import logging
 import warnings
 import argparse
+import threading
 from pprint import pformat
+from typing import Iterator
 
 import urllib3
 import configargparse
@@ -62,7 +66,15 @@ def args() -> argparse.Namespace:
         default=5,
         type=float,
         dest='sync_period',
-        help="Sync loop period")
+        help="External endpoints refresh period")
+
+    parser.add(
+        '--endpoint-updates-batch-period',
+        env_var='ENDPOINT_UPDATES_BATCH_PERIOD',
+        default=1,
+        type=float,
+        dest='endpoint_updates_batch_period',
+        help="Kubernetes endpoint updates batch period")
 
     parser.add(
         '--filter-name',
@@ -106,6 +118,21 @@ def args() -> argparse.Namespace:
         dest='kubernetes_api_token',
         help="Kubernetes API token")
 
+    parser.add(
+        '--k8s-api-insecure',
+        env_var='K8S_API_INSECURE',
+        action='store_true',
+        dest='kubernetes_api_insecure',
+        help="Disable kubernetes API server certificate verification")
+
+    parser.add(
+        '--k8s-pool-maxsize',
+        env_var='K8S_POOL_MAXSIZE',
+        default=32,
+        type=int,
+        dest='kubernetes_pool_maxsize',
+        help="Kubernetes API connection pool size")
+
     parser.add(
         '--os-auth-url',
         env_var='OS_AUTH_URL',
@@ -133,58 +160,125 @@ def args() -> argparse.Namespace:
     _args = parser.parse_args()
 
     if _args.endpoint_type == "openstack":
-        _args.external_auth = dict(
-            auth_url=_args.openstack_auth_url,
-            username=_args.openstack_username,
-            password=_args.openstack_password,
-            project_name=_args.openstack_project)
+        _args.external_auth = {
+            'auth_url': _args.openstack_auth_url,
+            'username': _args.openstack_username,
+            'password': _args.openstack_password,
+            'project_name': _args.openstack_project
+        }
+
+    _args.filters = {}
+    try:
+        if _args.filter_name:
+            _args.filters['name'] = re.compile(_args.filter_name)
+
+        if _args.filter_metadata:
+            _args.filters['metadata'] = {
+                re.compile(key): re.compile(value)
+                for key, value in (item.split(':', 1) for item in _args.filter_metadata.split())
+            }
+    except re.error as error:
+        parser.error(f"invalid filter regexp: {error}")
 
-    _args.filters = dict()
-    if _args.filter_name:
-        _args.filters['name'] = _args.filter_name
+    return _args
 
-    if _args.filter_metadata:
-        _args.filters['metadata'] = dict(
-            item.split(':') for item in _args.filter_metadata.split()
-        )
 
-    return _args
+def _produce(source: str, events: Iterator, _queue: queue.Queue) -> None:
+    """Forward events from iterator to the sync loop queue
+
+    Iterator failure is forwarded as event, so the sync loop can terminate
+    """
+    try:
+        for event in events:
+            _queue.put((source, event))
+    except Exception as error:  # pylint: disable=broad-except
+        _queue.put((source, error))
+
+
+def reconcile(kube_endpoint, external_endpoints) -> None:
+    """Sync kubernetes endpoint with in memory external endpoints state
+    """
+    if not kube_endpoint:
+        log.info("Skipping empty kubernetes endpoints")
+        return
+
+    if not external_endpoints:
+        log.info("Skipping emtpty external endpoints")
+        return
+
+    if kube_endpoint.address_keys == external_endpoints.address_keys:
+        log.info("External endpoints and kubernetes endpoints are in sync")
+        kube_endpoint.cancel_update()
+        return
+
+    diff = kube_endpoint.diff(external_endpoints.addresses)
+    log.info("Detected diffrent external endpoint state and kubernetes state: "
+             "%d added, %d removed", len(diff['added']), len(diff['removed']))
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Kubernetes endpoint addresses diff:\n%s", pformat(diff))
+    kube_endpoint.schedule_update(external_endpoints.addresses)
 
 
 def sync_loop(config, kube_endpoint, external_endpoints):
     """Kubernetes endpoint sync loop
+
+    Kubernetes endpoint changes are received from kubernetes watch, external
+    endpoints are refreshed one sync period after previous refresh finished.
+    Endpoints are reconciled only when one of the sides changes.
     """
 
     log.info("Starting sync loop: %fs %s -> kubernetes", config.sync_period, config.endpoint_type)
 
+    events = queue.Queue()
+    threading.Thread(target=_produce,
+                     args=('kubernetes', kube_endpoint.watch(), events),
+                     name='kubernetes-watch',
+                     daemon=True).start()
+
+    reconcile(kube_endpoint, external_endpoints)
+    next_refresh = time.monotonic() + config.sync_period
+
     while True:
-        time.sleep(config.sync_period)
-
-        log.info("Searching for kubernetes endpoints: %s/%s",
-                 config.kubernetes_namespace, config.kubernetes_endpoint)
-        kube_endpoint.refresh()
-        log.info("Kubernetes endpoints fetched:\n%s", pformat(kube_endpoint.addresses))
-
-        log.info("Searching for external endpoints "
-                 "with filters:\n%s", pformat(external_endpoints.filters))
-        external_endpoints.refresh()
-        log.info("External endpoint fetched:\n%s", pformat(external_endpoints.addresses))
-
-        if not kube_endpoint:
-            log.info("Skipping empty kubernetes endpoints")
-            continue
-
-        if not external_endpoints:
-            log.info("Skipping emtpty external endpoints")
-            continue
-
-        if kube_endpoint.addresses != external_endpoints.addresses:
-            log.info("Detected diffrent external endpoint state and kubernetes state:\n%s",
-                     kube_endpoint.diff(external_endpoints.addresses))
-            kube_endpoint.addresses = external_endpoints.addresses
-            log.info("Kubernetes endpoint state successfully updated:\n%s", kube_endpoint.addresses)
+        deadline = next_refresh
+        if kube_endpoint.pending_since is not None:
+            deadline = min(deadline,
+                           kube_endpoint.pending_since + config.endpoint_updates_batch_period)
+
+        try:
+            _, event = events.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            changed = False
         else:
-            log.info("External endpoints and kubernetes endpoints are in sync")
+            if isinstance(event, Exception):
+                raise event
+
+            kube_endpoint.update(event)
+            changed = True
+            log.info("Kubernetes endpoints changed: %s/%s, %d endpoints",
+                     config.kubernetes_namespace, config.kubernetes_endpoint,
+                     len(kube_endpoint.addresses))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Kubernetes endpoints fetched:\n%s", pformat(kube_endpoint.addresses))
+
+        if time.monotonic() >= next_refresh:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Searching for external endpoints "
+                          "with filters:\n%s", pformat(external_endpoints.filters))
+            external_endpoints.refresh()
+            next_refresh = time.monotonic() + config.sync_period
+            changed = True
+            log.info("External endpoints fetched: %d endpoints", len(external_endpoints.addresses))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("External endpoints fetched:\n%s", pformat(external_endpoints.addresses))
+
+        if changed:
+            reconcile(kube_endpoint, external_endpoints)
+
+        if kube_endpoint.flush_if_due(config.endpoint_updates_batch_period):
+            log.info("Kubernetes endpoint state successfully updated: %d endpoints",
+                     len(kube_endpoint.addresses))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Kubernetes endpoints updated:\n%s", pformat(kube_endpoint.addresses))
 
 
 def main():
@@ -196,7 +290,9 @@ def main():
         name=config.kubernetes_endpoint,
         namespace=config.kubernetes_namespace,
         api_server=config.kubernetes_api_server,
-        api_token=config.kubernetes_api_token
+        api_token=config.kubernetes_api_token,
+        api_insecure=config.kubernetes_api_insecure,
+        pool_maxsize=config.kubernetes_pool_maxsize
     )
 
     external_endpoints = external.factory(
@@ -6,13 +6,38 @@
 '''External kubernetes endpoint manager module common
 '''
 
+import threading
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+from kubernetes.client.models import V1EndpointAddress
+
+
+def address_keys(addresses: Iterable[V1EndpointAddress]) \
+        -> FrozenSet[Tuple[str, Optional[str], Optional[str]]]:
+    """Comparable representation of endpoint addresses
+
+    Args:
+        addresses (Iterable[V1EndpointAddress]): endpoint addresses
+
+    Returns:
+        (FrozenSet[Tuple[str, Optional[str], Optional[str]]]): set of (ip, hostname, node_name)
+    """
+    return frozenset((address.ip, address.hostname, address.node_name) for address in addresses)
+
+
 class MetaSingleton(type):
     """Singleton metaclass
     """
     __singleton_instances = {}
+    __lock = threading.Lock()
 
     def __call__(cls, *args, **kwargs):
-        if cls not in cls.__singleton_instances:
-            cls.__singleton_instances[cls] = super().__call__(*args, **kwargs)
+        instance = cls.__singleton_instances.get(cls)
+        if instance is None:
+            with cls.__lock:
+                instance = cls.__singleton_instances.get(cls)
+                if instance is None:
+                    instance = super().__call__(*args, **kwargs)
+                    cls.__singleton_instances[cls] = instance
 
-        return cls.__singleton_instances[cls]
+        return instance
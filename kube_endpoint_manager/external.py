@@ -6,15 +6,19 @@
 '''External kubernetes endpoint manager interface for external endpoints
 '''
 
-from typing import Optional, List
+from typing import Optional, List, FrozenSet, Tuple
 from abc import ABC, abstractmethod
 
 from kubernetes.client.models import V1EndpointAddress
 
+from .common import address_keys
+
 
 class ABCEndpoint(ABC):
     """External endpoint abstract base class
     """
+    __slots__ = ()
+
     @property
     @abstractmethod
     def hostname(self) -> str:
@@ -47,6 +51,8 @@ class ABCEndpoints(ABC):
         """Constructor
         """
         self._filters = filters
+        self._addresses_cache = None
+        self._address_keys_cache = None
 
     def __bool__(self):
         if self.addresses:
@@ -78,19 +84,36 @@ class ABCEndpoints(ABC):
     @property
     def addresses(self) -> List[V1EndpointAddress]:
         """(List[V1EndpointAddress]) addresses of endpoints in kubernetes format
-        """
-        addresses = []
 
-        for endpoint in self.endpoints:
-            addresses.append(
+        Addresses are cached until refresh
+        """
+        if self._addresses_cache is None:
+            self._addresses_cache = [
                 V1EndpointAddress(
                     hostname=endpoint.hostname,
                     node_name=endpoint.nodename,
                     ip=endpoint.address
                 )
-            )
+                for endpoint in self.endpoints
+            ]
+
+        return self._addresses_cache
 
-        return addresses
+    @property
+    def address_keys(self) -> FrozenSet[Tuple[str, Optional[str], Optional[str]]]:
+        """(FrozenSet[Tuple[str, Optional[str], Optional[str]]]) (ip, hostname, node_name)
+        set of endpoints for cheap comparison
+        """
+        if self._address_keys_cache is None:
+            self._address_keys_cache = address_keys(self.addresses)
+
+        return self._address_keys_cache
+
+    def _invalidate_addresses(self) -> None:
+        """Drop cached addresses, must be called when endpoints change
+        """
+        self._addresses_cache = None
+        self._address_keys_cache = None
 
     @abstractmethod
     def refresh(self) -> None:
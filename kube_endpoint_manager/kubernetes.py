@@ -6,15 +6,27 @@
 '''External kubernetes endpoint manager module kubernetes
 '''
 
-from typing import Optional, List
-
-from deepdiff import DeepDiff
+import os
+import logging
+from time import monotonic, sleep
+from typing import Optional, List, Iterator, FrozenSet, Tuple
+
+from urllib3.util import Retry
+from urllib3.exceptions import HTTPError
+from kubernetes.watch import Watch
 from kubernetes.client.rest import ApiException
 from kubernetes.client import ApiClient, CoreV1Api, Configuration
 from kubernetes.client.models import V1Endpoints, V1EndpointAddress
-from kubernetes.client.models.v1_endpoint_port import V1EndpointPort
+try:
+    from kubernetes.client.models import V1EndpointPort
+except ImportError:  # renamed in kubernetes client 21
+    from kubernetes.client.models import CoreV1EndpointPort as V1EndpointPort
+
+from .common import MetaSingleton, address_keys
 
-from .common import MetaSingleton
+log = logging.getLogger(__name__) # pylint: disable=invalid-name
+
+_WATCH_BACKOFF_MAX = 30
 
 
 class _APIClient(metaclass=MetaSingleton):
@@ -26,6 +38,8 @@ class _APIClient(metaclass=MetaSingleton):
         api_server (Optional[str]): kubernetes api server in host:port format
         api_token (Optional[str]): kubernetes bearer token, default token from
                                    /var/run/secrets/kubernetes.io/serviceaccount/token
+        api_insecure (bool): disable kubernetes api server certificate verification
+        pool_maxsize (int): kubernetes api connection pool size
 
     Properties:
         api_server (str): kubernetes connection string
@@ -34,18 +48,31 @@ class _APIClient(metaclass=MetaSingleton):
     """
     def __init__(self,
                  api_server: Optional[str] = None,
-                 api_token: Optional[str] = None):
+                 api_token: Optional[str] = None,
+                 api_insecure: bool = False,
+                 pool_maxsize: int = 32):
         """Constructor
         """
         if not hasattr(self, '_configuration') or not hasattr(self, '_client'):
             self._api_server = api_server or 'kubernetes.default.svc'
             self._api_token = api_token
+            self._token_path = '/var/run/secrets/kubernetes.io/serviceaccount/token'
+            self._ca_cert_path = '/var/run/secrets/kubernetes.io/serviceaccount/ca.crt'
+            self._token_mtime = None
+            self._cached_token = None
 
             self._configuration = Configuration()
-            self._configuration.verify_ssl = False
+            self._configuration.verify_ssl = not api_insecure
+            if os.path.exists(self._ca_cert_path):
+                self._configuration.ssl_ca_cert = self._ca_cert_path
+            self._configuration.connection_pool_maxsize = pool_maxsize
+            self._configuration.retries = Retry(total=3, backoff_factor=0.1)
             self._configuration.api_key_prefix['authorization'] = 'Bearer'
             self._configuration.host = self._connection
             self._configuration.api_key['authorization'] = self._token
+            if not self._api_token:
+                # pick up rotated service account token
+                self._configuration.refresh_api_key_hook = self._refresh_token
 
             self._client = ApiClient(self._configuration)
 
@@ -62,8 +89,21 @@ class _APIClient(metaclass=MetaSingleton):
         if self._api_token:
             return self._api_token
 
-        with open('/var/run/secrets/kubernetes.io/serviceaccount/token', 'r') as token:
-            return str(token.read())
+        mtime = os.stat(self._token_path).st_mtime_ns
+        if mtime != self._token_mtime:
+            with open(self._token_path, 'r') as token:
+                self._cached_token = token.read().strip()
+            self._token_mtime = mtime
+
+        return self._cached_token
+
+    def _refresh_token(self, configuration: Configuration) -> None:
+        """Refresh bearer token in configuration before API request
+
+        Args:
+            configuration (:obj:Configuration): kubernetes client configuration
+        """
+        configuration.api_key['authorization'] = self._token
 
     @property
     def api_server(self) -> str:
@@ -105,23 +145,43 @@ class Endpoint:
         api_server (Optional[str]): kubernetes api server in host:port format
         api_token (Optional[str]): kubernetes bearer token, default token from
                                    /var/run/secrets/kubernetes.io/serviceaccount/token
+        api_insecure (bool): disable kubernetes api server certificate verification
+        pool_maxsize (int): kubernetes api connection pool size
 
     Properties:
         name (Optional[str]): kubernetes endpoint name
         namespace (Optional[str]): kubernetes endpoint namespace
         ports (List[V1EndpointPort]): kubernetes endpoint subset ports
         addresses (List[V1EndpointAddress]): get addresses (also setter)
+        address_keys (FrozenSet[Tuple]): (ip, hostname, node_name) set of addresses
+        pending_since (Optional[float]): monotonic time of first scheduled update
 
     Methods:
         refresh (None): Refresh in memory kubernetes endpoint object
+        update (None): Replace in memory kubernetes endpoint object
+        schedule_update (None): Schedule batched addresses update
+        cancel_update (None): Drop scheduled addresses update
+        flush_if_due (bool): Patch scheduled addresses after batch period
+        watch (Iterator[Optional[V1Endpoints]]): Watch kubernetes endpoint object changes
         diff (dict): comapre addresses
 
     """
-    def __init__(self, name, namespace, api_server=None, api_token=None):
+    __slots__ = ('_name', '_namespace', '_api', '_last_rv', '_endpoint',
+                 '_addresses_cache', '_address_keys_cache', '_pending', '_pending_since')
+
+    def __init__(self, name, namespace, api_server=None, api_token=None,
+                 api_insecure=False, pool_maxsize=32):
         self._name = name
         self._namespace = namespace
-        self._api = _APICoreV1(api_server=api_server, api_token=api_token)
-        self._endpoint = self._read_endpoint()
+        self._api = _APICoreV1(api_server=api_server, api_token=api_token,
+                               api_insecure=api_insecure, pool_maxsize=pool_maxsize)
+        self._last_rv = None
+        self._endpoint = None
+        self._addresses_cache = None
+        self._address_keys_cache = None
+        self._set_endpoint(self._read_endpoint())
+        self._pending = None
+        self._pending_since = None
 
     def __bool__(self):
         """(bool): check for existence of endpoint in kubernetes
@@ -134,16 +194,44 @@ class Endpoint:
     def __repr__(self):
         return repr(self.addresses)
 
+    def _list_endpoint(self, resource_version: Optional[str]) \
+            -> Tuple[Optional[V1Endpoints], str]:
+        """List endpoint object by name
+
+        Args:
+            resource_version (Optional[str]): list is served from api server watch
+                cache not older than resource version, None for consistent read
+                (resource_version_match requires kubernetes client >= 19)
+
+        Returns:
+            (Tuple[Optional[V1Endpoints], str]): endpoint object or None if endpoint
+                does not exist and list resource version
+        """
+        kwargs = {}
+        if resource_version is not None:
+            kwargs = {
+                'resource_version': resource_version,
+                'resource_version_match': 'NotOlderThan'
+            }
+
+        response = self._api.list_namespaced_endpoints(
+            namespace=self._namespace,
+            field_selector=f'metadata.name={self._name}',
+            **kwargs
+        )
+        endpoint = response.items[0] if response.items else None
+        return endpoint, response.metadata.resource_version
+
     def _read_endpoint(self) -> Optional[V1Endpoints]:
         """(Optional[V1Endpoints]): return endpoint object
         """
         try:
-            return self._api.read_namespaced_endpoints(name=self._name,
-                                                       namespace=self._namespace)
+            # resource version of the list is starting point for watch
+            endpoint, self._last_rv = self._list_endpoint(self._last_rv or '0')
         except ApiException:
-            pass
+            return None
 
-        return None
+        return endpoint
 
     @property
     def name(self) -> Optional[str]:
@@ -191,7 +279,80 @@ class Endpoint:
     def refresh(self) -> None:
         """Sync in memory endpoint with kubernetes state
         """
-        self._endpoint = self._read_endpoint()
+        self._set_endpoint(self._read_endpoint())
+
+    def _set_endpoint(self, endpoint: Optional[V1Endpoints]) -> None:
+        """Replace in memory endpoint and drop cached addresses
+
+        Args:
+            endpoint (Optional[V1Endpoints]): endpoint object
+        """
+        self._endpoint = endpoint
+        self._addresses_cache = None
+        self._address_keys_cache = None
+
+    def update(self, endpoint: Optional[V1Endpoints]) -> None:
+        """Replace in memory endpoint with object received from kubernetes
+
+        Args:
+            endpoint (Optional[V1Endpoints]): endpoint object or None if endpoint was deleted
+        """
+        self._set_endpoint(endpoint)
+
+    def watch(self, timeout_seconds: int = 600) -> Iterator[Optional[V1Endpoints]]:
+        """Watch kubernetes endpoint object changes
+
+        Watch is started from resource version of last endpoint read and
+        reconnected after server side timeout. Expired resource version (410 Gone)
+        relists endpoint with consistent read, yields its state and restarts watch
+        from list resource version. Connection failures, 429
+        and 5xx responses reconnect from last resource version with backoff,
+        other API errors are raised.
+
+        Args:
+            timeout_seconds (int): server side watch timeout
+
+        Yields:
+            (Optional[V1Endpoints]): changed endpoint object or None if endpoint was deleted
+        """
+        resource_version = self._last_rv
+        relist = False
+        backoff = 1
+
+        while True:
+            try:
+                if relist:
+                    endpoint, resource_version = self._list_endpoint(None)
+                    relist = False
+                    yield endpoint
+
+                for event in Watch().stream(self._api.list_namespaced_endpoints,
+                                            namespace=self._namespace,
+                                            field_selector=f'metadata.name={self._name}',
+                                            resource_version=resource_version,
+                                            timeout_seconds=timeout_seconds):
+                    backoff = 1
+                    endpoint = event['object']
+                    resource_version = endpoint.metadata.resource_version
+                    if event['type'] == 'DELETED':
+                        yield None
+                    else:
+                        yield endpoint
+                continue
+            except ApiException as error:
+                if error.status == 410:
+                    relist = True
+                    continue
+                if error.status != 429 and (error.status or 0) < 500:
+                    raise
+                log.warning("Kubernetes endpoint watch failed, reconnecting in %ds: %s %s",
+                            backoff, error.status, error.reason)
+            except HTTPError as error:
+                log.warning("Kubernetes endpoint watch connection failed, reconnecting in %ds: %s",
+                            backoff, error)
+
+            sleep(backoff)
+            backoff = min(backoff * 2, _WATCH_BACKOFF_MAX)
 
     @property
     def addresses(self) -> List[V1EndpointAddress]:
@@ -199,21 +360,89 @@ class Endpoint:
 
         Patch kubernetes endpoint object with new list of subset addresses
 
+        Addresses are cached until endpoint object changes
+
         Returns:
             (List[V1EndpointAddress]): kubernetes endpoint subset addresses
         """
-        if not self._endpoint or not self._endpoint.subsets[0].addresses:
-            return []
+        if self._addresses_cache is None:
+            if not self._endpoint or not self._endpoint.subsets[0].addresses:
+                self._addresses_cache = []
+            else:
+                self._addresses_cache = list(self._endpoint.subsets[0].addresses)
 
-        return list(self._endpoint.subsets[0].addresses)
+        return self._addresses_cache
 
     @addresses.setter
     def addresses(self, value) -> None:
         """
         """
-        if self._endpoint and self.diff(value):
-            self._patch_addresses(value)
-            self.refresh()
+        self._apply(value)
+
+    def _apply(self, value: List[V1EndpointAddress]) -> bool:
+        """Patch addresses when they differ from kubernetes state
+
+        Args:
+            value (List[V1EndpointAddress]): new endpoint subset addresses
+
+        Returns:
+            (bool): endpoint was patched
+        """
+        if not self._endpoint or self.address_keys == address_keys(value):
+            return False
+
+        self._set_endpoint(self._patch_addresses(value))
+        return True
+
+    @property
+    def address_keys(self) -> FrozenSet[Tuple[str, Optional[str], Optional[str]]]:
+        """(FrozenSet[Tuple[str, Optional[str], Optional[str]]]): (ip, hostname, node_name)
+        set of addresses for cheap comparison
+        """
+        if self._address_keys_cache is None:
+            self._address_keys_cache = address_keys(self.addresses)
+
+        return self._address_keys_cache
+
+    @property
+    def pending_since(self) -> Optional[float]:
+        """(Optional[float]): monotonic time of first scheduled update or None
+        """
+        return self._pending_since
+
+    def schedule_update(self, value: List[V1EndpointAddress]) -> None:
+        """Schedule batched addresses update
+
+        Updates scheduled within batch period are collapsed into single patch
+        with the last scheduled addresses
+
+        Args:
+            value (List[V1EndpointAddress]): new endpoint subset addresses
+        """
+        self._pending = value
+        if self._pending_since is None:
+            self._pending_since = monotonic()
+
+    def cancel_update(self) -> None:
+        """Drop scheduled addresses update, kubernetes state is already in sync
+        """
+        self._pending = None
+        self._pending_since = None
+
+    def flush_if_due(self, batch_period: float) -> bool:
+        """Patch scheduled addresses when batch period elapsed
+
+        Args:
+            batch_period (float): batch period in seconds
+
+        Returns:
+            (bool): scheduled addresses were patched
+        """
+        if self._pending_since is None or monotonic() - self._pending_since < batch_period:
+            return False
+
+        value, self._pending, self._pending_since = self._pending, None, None
+        return self._apply(value)
 
     @property
     def ports(self) -> List[V1EndpointPort]:
@@ -228,8 +457,14 @@ class Endpoint:
             addresses (List[V1EndpointAddress]): endpoint addresses to compare
 
         Returns:
-            (dict): addresses diffrence in text representation or empty dict
+            (dict): added and removed (ip, hostname, node_name) addresses
         """
         if not self._endpoint:
             return None
-        return DeepDiff(self.addresses, addresses).to_dict()
+
+        old = self.address_keys
+        new = address_keys(addresses)
+        return {
+            'added': sorted(new - old, key=str),
+            'removed': sorted(old - new, key=str)
+        }
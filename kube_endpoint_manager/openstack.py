@@ -7,8 +7,11 @@
 '''
 
 import re
-from typing import Optional, List
+from typing import Optional, List, Pattern, Tuple
 
+from keystoneauth1.identity import v3
+from keystoneauth1.session import Session
+from requests.adapters import HTTPAdapter
 from openstack.connection import Connection as OpenStackConnection
 from openstack.compute.v2._proxy import Proxy as OpenStackComputeProxy
 from openstack.compute.v2.server import Server as OpenStackServer
@@ -17,6 +20,11 @@ from .external import ABCEndpoint, ABCEndpoints
 from .common import MetaSingleton
 
 
+_NETWORK_NAME_RE = re.compile(r'.*endpoint\.network\.name$')
+_NETWORK_VERSION_RE = re.compile(r'.*endpoint\.network\.version$')
+_REGEXP_SPECIAL_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+
 class _APIClient(metaclass=MetaSingleton):
     """Openstack API client wrapper
 
@@ -29,6 +37,7 @@ class _APIClient(metaclass=MetaSingleton):
         project_name (str):  openstack project name
         user_domain_id (Optional[str]): openstack user domain id
         project_domain_id (Optional[str]): openstack project domain id
+        pool_maxsize (int): openstack api connection pool size
 
     Properties:
         client (:obj:OpenStackConnection): openstack api client
@@ -40,19 +49,28 @@ class _APIClient(metaclass=MetaSingleton):
                  password: str,
                  project_name: str,
                  user_domain_id: Optional[str] = 'default',
-                 project_domain_id: Optional[str] = 'default'):
+                 project_domain_id: Optional[str] = 'default',
+                 pool_maxsize: int = 64):
         """Constructor
         """
-        self._client = OpenStackConnection(
-            auth=dict(
-                auth_url=auth_url,
-                username=username,
-                password=password,
-                project_name=project_name,
-                user_domain_id=user_domain_id,
-                project_domain_id=project_domain_id
-            )
+        auth = v3.Password(
+            auth_url=auth_url,
+            username=username,
+            password=password,
+            project_name=project_name,
+            user_domain_id=user_domain_id,
+            project_domain_id=project_domain_id
         )
+        session = Session(auth=auth)
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize)
+        session.session.mount('https://', adapter)
+        session.session.mount('http://', adapter)
+
+        self._client = OpenStackConnection(session=session)
+        # authenticate and discover service catalog once, token and compute
+        # endpoint are reused by all following requests of the connection
+        self._client.authorize()
+        self._compute = self._client.compute # pylint: disable=no-member
 
     @property
     def client(self) -> OpenStackConnection:
@@ -64,7 +82,7 @@ class _APIClient(metaclass=MetaSingleton):
     def compute(self) -> OpenStackComputeProxy:
         """(:obj:OpenStackComputeProxy) openstack compute api client
         """
-        return self._client.compute # pylint: disable=no-member
+        return self._compute
 
 
 class Endpoint(ABCEndpoint):
@@ -82,6 +100,8 @@ class Endpoint(ABCEndpoint):
         metadata (dict): instance metadata
 
     """
+    __slots__ = ('_server', '_network_name', '_network_version', '_address')
+
     def __init__(self, server: OpenStackServer):
         """Constructor
         """
@@ -105,9 +125,8 @@ class Endpoint(ABCEndpoint):
     def _metadata_network_name(self) -> Optional[str]:
         """(Optional[str]): openstack instance network name
         """
-        network_name_key = re.compile(r'.*endpoint.network.name$')
         for key, value in self.metadata.items():
-            if network_name_key.match(key):
+            if _NETWORK_NAME_RE.match(key):
                 return str(value)
         return None
 
@@ -115,50 +134,29 @@ class Endpoint(ABCEndpoint):
     def _metadata_network_version(self) -> Optional[str]:
         """(Optional[str]): openstack instance network version
         """
-        network_version_key = re.compile(r'.*endpoint.network.version$')
         for key, value in self.metadata.items():
-            if network_version_key.match(key):
+            if _NETWORK_VERSION_RE.match(key):
                 return str(value)
         return None
 
-    def _is_network_version(self, address: dict) -> bool:
-        """Check address network version
-
-        Args:
-            address (dict): OpenStackServer.addresses.address
-                            (example: OpenStackServer.addresses[NETNAME][0])
-        Returns:
-            (bool): address version is equal as object address version
-        """
-        if not self._network_version:
-            return True
-
-        return bool(self._network_version == str(address['version']))
-
-    @property
-    def _has_named_network(self) -> bool:
-        """(bool): check server for network named network
-        """
-        if not self._metadata_network_name:
-            return False
-
-        return bool(self._metadata_network_name in self._server.addresses)
-
     @property
     def _network_address(self) -> Optional[str]:
         """(Optional[str]): openstack instance ip
+
+        First address with matching version from named network (if server
+        has it) or from any network
         """
-        if self._has_named_network:
-            # find named ip address with address version match
-            for address in self._server.addresses[self._metadata_network_name]:
-                if self._is_network_version(address):
-                    return str(address['addr'])
+        name, version = self._network_name, self._network_version
+        addresses = self._server.addresses
+        if name and name in addresses:
+            networks = (addresses[name],)
         else:
-            # find ip address with address version match
-            for addresses in self._server.addresses.values():
-                for address in addresses:
-                    if self._is_network_version(address):
-                        return str(address['addr'])
+            networks = addresses.values()
+
+        for network in networks:
+            for address in network:
+                if not version or version == str(address['version']):
+                    return str(address['addr'])
 
         # no address match selection criteria
         return None
@@ -211,6 +209,7 @@ class Endpoints(ABCEndpoints):
             name - regexp filter on openstack instance name
             metadata - regexp filter on openstack instance metadata key and value
                 key (regexp): value (regexp)
+            regexp can be passed as string or compiled pattern
 
     Properties:
         endpoints (List[Endpoint]): openstack endpoints for kubernetes mapping
@@ -223,6 +222,8 @@ class Endpoints(ABCEndpoints):
         """Constructor
         """
         super().__init__(auth=auth, filters=filters)
+        self._compiled_filters = self._compile_filters(filters)
+        self._server_query = self._server_query_filters(filters)
         self._api = _APIClient(**auth)
         self._endpoints = self._endpoint_list()
 
@@ -235,36 +236,78 @@ class Endpoints(ABCEndpoints):
         return False
 
     @staticmethod
-    def _filter_server_name(server, _filter: str) -> bool:
+    def _compile_filters(filters: dict) -> dict:
+        """Compile regexp filters once for all servers
+
+        Args:
+            filters (dict): openstack server filters, regexp as string or compiled pattern
+
+        Returns:
+            (dict): filters with compiled regexp
+        """
+        compiled = {}
+        if 'name' in filters:
+            compiled['name'] = re.compile(filters['name'])
+        if 'metadata' in filters:
+            compiled['metadata'] = [
+                (re.compile(key), re.compile(value))
+                for key, value in filters['metadata'].items()
+            ]
+        return compiled
+
+    @staticmethod
+    def _server_query_filters(filters: dict) -> dict:
+        """Server side (nova) query filters
+
+        Only literal name filter is passed to nova, nova matches name as
+        substring so the regexp filter is still applied on returned servers.
+        Nova does not support filtering by metadata.
+
+        Args:
+            filters (dict): openstack server filters
+
+        Returns:
+            (dict): query parameters for compute servers listing
+        """
+        query = {}
+        name = filters.get('name')
+        if isinstance(name, re.Pattern):
+            name = name.pattern
+        if name and not _REGEXP_SPECIAL_CHARS.intersection(name):
+            query['name'] = name
+        return query
+
+    @staticmethod
+    def _filter_server_name(server, _filter: Pattern) -> bool:
         """Filter openstack server by name with regexp
 
         Args:
-            _filter (str): regexp on openstack server name
+            _filter (Pattern): regexp on openstack server name
 
         Returns:
             (bool)
         """
-        return bool(re.match(_filter, server.name))
+        return bool(_filter.match(server.name))
 
     @staticmethod
-    def _filter_server_metadata(server, _filter: dict) -> bool:
+    def _filter_server_metadata(server, _filter: List[Tuple[Pattern, Pattern]]) -> bool:
         """Filter openstack server by metadata with key and value as regexp
 
         Args:
-            _filter (dict): key (regexp): value (regexp)
+            _filter (List[Tuple[Pattern, Pattern]]): key (regexp), value (regexp)
 
         Returns:
             (bool)
         """
         def __filter(filter_key, filter_value):
             for meta_key, meta_value in server.metadata.items():
-                if re.match(filter_key, meta_key):
-                    if not re.match(filter_value, meta_value):
+                if filter_key.match(meta_key):
+                    if not filter_value.match(meta_value):
                         return False
                     return True
             return False
 
-        for filter_key, filter_value in _filter.items():
+        for filter_key, filter_value in _filter:
             if not __filter(filter_key, filter_value):
                 return False
 
@@ -279,7 +322,7 @@ class Endpoints(ABCEndpoints):
         Returns:
             (bool)
         """
-        for name, value in self.filters.items():
+        for name, value in self._compiled_filters.items():
             if hasattr(self, f'_filter_server_{name}'):
                 if not getattr(self, f'_filter_server_{name}')(server, value):
                     return False
@@ -288,13 +331,11 @@ class Endpoints(ABCEndpoints):
     def _endpoint_list(self) -> List[Endpoint]:
         """(List[Endpoint]) openstack endpoints for kubernetes mapping
         """
-        endpoints = []
-        for server in self._api.compute.servers():
-            if self._is_endpoint_server(server):
-                endpoint = Endpoint(server)
-                if endpoint.has_address:
-                    endpoints.append(Endpoint(server))
-        return endpoints
+        # nova pages with marker of the last server of previous page, pages
+        # can't be requested concurrently, the sdk follows next links lazily
+        servers = self._api.compute.servers(details=True, **self._server_query)
+        candidates = (Endpoint(server) for server in servers if self._is_endpoint_server(server))
+        return [endpoint for endpoint in candidates if endpoint.has_address]
 
     @property
     def endpoints(self) -> List[Endpoint]:
@@ -306,3 +347,4 @@ class Endpoints(ABCEndpoints):
         """Sync in memory endpoints with openstack state
         """
         self._endpoints = self._endpoint_list()
+        self._invalidate_addresses()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2019 Martin Dojcak
+# See LICENSE for details.
+
+'''Tests for kubernetes endpoint sync
+'''
+
+import time
+import argparse
+import threading
+from unittest import mock
+
+import pytest
+from urllib3.exceptions import ProtocolError
+from kubernetes.client.rest import ApiException
+from kubernetes.client.models import (V1Endpoints, V1EndpointsList, V1EndpointSubset,
+                                      V1EndpointAddress, V1ListMeta, V1ObjectMeta)
+
+from kube_endpoint_manager import kubernetes
+from kube_endpoint_manager.kubernetes import V1EndpointPort
+from kube_endpoint_manager.__main__ import reconcile, sync_loop
+from kube_endpoint_manager.common import address_keys
+
+
+def _endpoints(*ips):
+    return V1Endpoints(
+        metadata=V1ObjectMeta(name='test', namespace='default', resource_version='1'),
+        subsets=[V1EndpointSubset(addresses=_addresses(*ips),
+                                  ports=[V1EndpointPort(port=80)])]
+    )
+
+
+def _addresses(*ips):
+    return [V1EndpointAddress(ip=ip) for ip in ips]
+
+
+class FakeCoreV1Api:
+    """Kubernetes core/v1 API serving single endpoint object
+    """
+    def __init__(self, *args, **kwargs):
+        self.endpoint = _endpoints('1.1.1.1')
+        self.patches = []
+
+    def list_namespaced_endpoints(self, **kwargs):
+        items = [self.endpoint] if self.endpoint else []
+        return V1EndpointsList(items=items, metadata=V1ListMeta(resource_version='1'))
+
+    def patch_namespaced_endpoints(self, name, namespace, body, **kwargs):
+        addresses = body['subsets'][0]['addresses']
+        self.patches.append([address.ip for address in addresses])
+        self.endpoint = _endpoints(*(address.ip for address in addresses))
+        return self.endpoint
+
+
+class FakeExternalEndpoints:
+    """External endpoints with settable addresses
+    """
+    def __init__(self, *ips):
+        self.addresses = _addresses(*ips)
+
+    def __bool__(self):
+        return bool(self.addresses)
+
+    @property
+    def address_keys(self):
+        return address_keys(self.addresses)
+
+
+@pytest.fixture
+def kube_endpoint():
+    with mock.patch.object(kubernetes, '_APICoreV1', FakeCoreV1Api):
+        yield kubernetes.Endpoint(name='test', namespace='default')
+
+
+def test_reconcile_schedules_update(kube_endpoint):
+    external_endpoints = FakeExternalEndpoints('2.2.2.2')
+
+    reconcile(kube_endpoint, external_endpoints)
+
+    assert kube_endpoint.pending_since is not None
+    assert kube_endpoint.flush_if_due(0)
+    assert kube_endpoint._api.patches == [['2.2.2.2']]  # pylint: disable=protected-access
+    assert kube_endpoint.address_keys == external_endpoints.address_keys
+
+
+def test_reconcile_cancels_update_when_in_sync(kube_endpoint):
+    external_endpoints = FakeExternalEndpoints('2.2.2.2')
+    reconcile(kube_endpoint, external_endpoints)
+
+    external_endpoints.addresses = _addresses('1.1.1.1')
+    reconcile(kube_endpoint, external_endpoints)
+
+    assert kube_endpoint.pending_since is None
+    assert not kube_endpoint.flush_if_due(0)
+    assert kube_endpoint._api.patches == []  # pylint: disable=protected-access
+
+
+def test_flush_without_change_is_not_patched(kube_endpoint):
+    kube_endpoint.schedule_update(_addresses('1.1.1.1'))
+
+    assert not kube_endpoint.flush_if_due(0)
+    assert kube_endpoint.pending_since is None
+    assert kube_endpoint._api.patches == []  # pylint: disable=protected-access
+
+
+def _watch(*streams):
+    """Watch class returning streams in order, exception instance is raised
+    """
+    streams = list(streams)
+
+    class FakeWatch:
+        def stream(self, func, **kwargs):
+            result = streams.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return iter(result)
+
+    return FakeWatch
+
+
+def test_watch_reconnects_after_connection_failure(kube_endpoint):
+    endpoint = _endpoints('2.2.2.2')
+    fake_watch = _watch(ProtocolError('Connection broken'),
+                        ApiException(status=503),
+                        [{'type': 'MODIFIED', 'object': endpoint}])
+
+    with mock.patch.object(kubernetes, 'Watch', fake_watch), \
+            mock.patch.object(kubernetes, 'sleep') as sleep:
+        assert next(kube_endpoint.watch()) is endpoint
+
+    assert sleep.call_count == 2
+
+
+def test_watch_raises_on_forbidden(kube_endpoint):
+    with mock.patch.object(kubernetes, 'Watch', _watch(ApiException(status=403))):
+        with pytest.raises(ApiException):
+            next(kube_endpoint.watch())
+
+
+def test_watch_relists_after_gone(kube_endpoint):
+    kube_endpoint._api.endpoint = None  # pylint: disable=protected-access
+    endpoint = _endpoints('2.2.2.2')
+    fake_watch = _watch(ApiException(status=410),
+                        [{'type': 'ADDED', 'object': endpoint}])
+
+    with mock.patch.object(kubernetes, 'Watch', fake_watch):
+        watch = kube_endpoint.watch()
+        assert next(watch) is None
+        assert next(watch) is endpoint
+
+
+class StopSync(Exception):
+    """Terminates sync loop in tests
+    """
+
+
+class SlowExternalEndpoints(FakeExternalEndpoints):
+    """External endpoints with refresh slower than sync period
+    """
+    filters = {}
+
+    def __init__(self, *ips, duration, limit):
+        super().__init__(*ips)
+        self.duration = duration
+        self.limit = limit
+        self.refreshes = []
+
+    def refresh(self):
+        if len(self.refreshes) == self.limit:
+            raise StopSync()
+        start = time.monotonic()
+        time.sleep(self.duration)
+        self.refreshes.append((start, time.monotonic()))
+
+
+def _idle_watch(_self):
+    return iter(threading.Event().wait, True)
+
+
+def test_sync_loop_does_not_queue_refreshes_slower_than_period(kube_endpoint):
+    config = argparse.Namespace(sync_period=0.05, endpoint_updates_batch_period=1,
+                                endpoint_type='test', kubernetes_namespace='default',
+                                kubernetes_endpoint='test')
+    external_endpoints = SlowExternalEndpoints('1.1.1.1', duration=0.15, limit=4)
+    with mock.patch.object(kubernetes.Endpoint, 'watch', _idle_watch):
+        with pytest.raises(StopSync):
+            sync_loop(config, kube_endpoint, external_endpoints)
+
+    refreshes = external_endpoints.refreshes
+    for (_, previous_end), (start, _) in zip(refreshes, refreshes[1:]):
+        assert start - previous_end >= config.sync_period